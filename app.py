@@ -1,16 +1,33 @@
 # ----------------------------- app.py -----------------------------
 import os
+import json
+import queue
+import time
 import sqlite3
+import threading
 import psycopg2
 import psycopg2.extras
-from urllib.parse import urlparse
+import psycopg2.pool
 from datetime import datetime
 from flask import (
     Flask, render_template, request, redirect, url_for,
     session, g, flash, abort
 )
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
+from contextlib import contextmanager
+from collections import deque
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
 
 
 # Prefer init_db helpers if present
@@ -21,14 +38,30 @@ try:
         from init_db import IS_POSTGRES as INIT_IS_POSTGRES
     except Exception:
         INIT_IS_POSTGRES = None
+    # ...and its normalized Postgres DSN
+    try:
+        from init_db import _PG_DSN as INIT_PG_DSN
+    except Exception:
+        INIT_PG_DSN = None
+    # ...and its connection reuse (shared pool / cached SQLite handle)
+    try:
+        from init_db import release_connection as init_release_connection, get_pg_pool as init_get_pg_pool
+    except Exception:
+        init_release_connection = None
+        init_get_pg_pool = None
     HAS_INIT_DB = True
 except Exception:
     init_get_connection = None
     init_db_func = None
     INIT_IS_POSTGRES = None
+    INIT_PG_DSN = None
+    init_release_connection = None
+    init_get_pg_pool = None
     HAS_INIT_DB = False
 
 app = Flask(__name__, instance_relative_config=True)
+# Trust only the X-Forwarded-For hop appended by the platform router
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key")
 os.makedirs(app.instance_path, exist_ok=True)
 
@@ -37,16 +70,49 @@ os.makedirs(app.instance_path, exist_ok=True)
 DATABASE_URL = os.environ.get("DATABASE_PUBLIC_URL") or os.environ.get("DATABASE_URL")
 IS_POSTGRES = bool(DATABASE_URL) if INIT_IS_POSTGRES is None else INIT_IS_POSTGRES
 
+# Postgres DSN comes from init_db so both modules connect with the same URL
+PG_DSN = INIT_PG_DSN
+if PG_DSN is None and DATABASE_URL:
+    # init_db unavailable: normalize here the same way
+    PG_DSN = DATABASE_URL
+    # Normalize old-style URLs (Heroku style)
+    if PG_DSN.startswith("postgres://"):
+        PG_DSN = PG_DSN.replace("postgres://", "postgresql://", 1)
+    if "sslmode" not in PG_DSN:
+        PG_DSN += ("&" if "?" in PG_DSN else "?") + "sslmode=require"
+
+# SQL specialized for the active backend once, at startup
+app.config["PARAMSTYLE"] = "%s" if IS_POSTGRES else "?"
+_ps = app.config["PARAMSTYLE"]
+app.config["LOG_SQL"] = {
+    "admin": f"INSERT INTO admin_activity (admin_id, role, action) VALUES ({_ps}, {_ps}, {_ps})",
+    "other": f"INSERT INTO cloud_activity (user_id, role, action) VALUES ({_ps}, {_ps}, {_ps})",
+}
+
+
+# Password hashing backend (OpenSSL-backed scrypt); check_password_hash reads the
+# method from each stored hash, so older pbkdf2 hashes keep verifying.
+PASSWORD_HASH_METHOD = "scrypt"
 
 # Local DB path
 DB_PATH = os.path.join(app.instance_path, "tourism.db")
 
-# Run init_db if available (safe)
-if init_db_func:
-    try:
-        init_db_func()
-    except Exception as e:
-        print("⚠️ init_db() failed or skipped:", e)
+# Process-wide Postgres pool (connections are reused across requests); built on
+# first use by get_pg_pool() so importing app.py / running flask commands stays offline
+app.config["pg_pool"] = None
+_PG_POOL_TRIED = False
+_PG_POOL_LOCK = threading.Lock()
+
+# Schema setup runs via `flask --app app init-db` or lazily on the first request,
+# not at import time (see ensure_db_initialized)
+INIT_LOCK_PATH = os.path.join(app.instance_path, "init_db.lock")
+_DB_READY = False
+_DB_READY_LOCK = threading.Lock()
+
+# Optional Redis cache for package listings (enabled when REDIS_URL is set)
+REDIS_URL = os.environ.get("REDIS_URL")
+cache = redis.Redis.from_url(REDIS_URL) if (redis and REDIS_URL) else None
+PACKAGES_CACHE_TTL = 300
 
 
 # ---------------- Database helpers ----------------
@@ -61,18 +127,7 @@ def get_connection():
 
     if IS_POSTGRES:
         try:
-            dburl = DATABASE_URL
-            if dburl and dburl.startswith("postgres://"):
-                dburl = dburl.replace("postgres://", "postgresql://", 1)
-            url = urlparse(dburl)
-            conn = psycopg2.connect(
-                database=url.path[1:],
-                user=url.username,
-                password=url.password,
-                host=url.hostname,
-                port=url.port or 5432,
-                sslmode="require"
-            )
+            conn = psycopg2.connect(PG_DSN)
             conn.autocommit = False
             return conn
         except Exception as e:
@@ -86,9 +141,34 @@ def get_connection():
     return conn
 
 
+def get_pg_pool():
+    """Return the Postgres pool, creating it on first call (None on SQLite or if creation failed)."""
+    global _PG_POOL_TRIED
+    if IS_POSTGRES and not _PG_POOL_TRIED:
+        with _PG_POOL_LOCK:
+            if not _PG_POOL_TRIED:
+                try:
+                    if init_get_pg_pool:
+                        # share init_db's pool rather than opening a second one
+                        app.config["pg_pool"] = init_get_pg_pool()
+                    else:
+                        app.config["pg_pool"] = psycopg2.pool.ThreadedConnectionPool(minconn=2, maxconn=20, dsn=PG_DSN)
+                except Exception as e:
+                    print("❌ Postgres pool creation failed, using per-request connections:", e)
+                _PG_POOL_TRIED = True
+    return app.config["pg_pool"]
+
+
 def get_db():
     if "db" not in g:
-        g.db = get_connection()
+        pool = get_pg_pool()
+        if pool:
+            g.db = pool.getconn()
+            g.db.autocommit = False
+        else:
+            # On SQLite this is init_db's process-wide connection; its lock is held
+            # until close_db() so requests never interleave statements on it.
+            g.db = get_connection()
     return g.db
 
 
@@ -100,11 +180,57 @@ def close_db(exc):
     db = g.pop("db", None)
     if db:
         try:
-            db.close()
+            pool = app.config.get("pg_pool")
+            if pool:
+                # putconn rolls back any transaction left open by the request
+                pool.putconn(db)
+            elif init_release_connection:
+                # rolls back anything left open and, for the shared SQLite handle, unlocks it
+                init_release_connection(db)
+            else:
+                db.close()
         except Exception as e:
             print("DB close error:", e)
 
 
+def ensure_db_initialized():
+    """
+    Run init_db once per process. The file lock serializes workers that start
+    together so they don't race on the same DDL.
+    """
+    global _DB_READY
+    if _DB_READY or not init_db_func:
+        return
+    with _DB_READY_LOCK:
+        if _DB_READY:
+            return
+        with open(INIT_LOCK_PATH, "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                init_db_func()
+            except Exception as e:
+                print("⚠️ init_db() failed or skipped:", e)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        _DB_READY = True
+
+
+@app.before_request
+def _init_db_on_first_request():
+    ensure_db_initialized()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create tables, indexes and demo data."""
+    if not init_db_func:
+        print("⚠️ init_db module not available.")
+        return
+    init_db_func()
+
+
 # ---------------- Unified executor ----------------
 def _adapt_placeholders(sql: str) -> str:
     return sql.replace("?", "%s") if IS_POSTGRES else sql
@@ -149,10 +275,13 @@ def db_execute(sql, params=(), fetchone=False, fetchall=False, commit=False, ret
         finally:
             cur.close()
 
-    # SQLite path
+    # SQLite path (shared connection runs in autocommit mode; writes take the
+    # write lock up front unless the caller already opened a transaction)
     else:
         cur = db.cursor()
         try:
+            if commit and not db.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
             cur.execute(sql2, params or ())
             if return_lastrowid:
                 new_id = cur.lastrowid
@@ -183,22 +312,231 @@ def db_execute(sql, params=(), fetchone=False, fetchall=False, commit=False, ret
             cur.close()
 
 
+@contextmanager
+def db_transaction():
+    """
+    Group several db_execute calls into one transaction (call them with commit=False).
+    Commits on success, rolls back if the block raises. On SQLite the write lock is
+    taken up front so the transaction never has to upgrade (and hit SQLITE_BUSY)
+    halfway through; on Postgres inserts get their id back via RETURNING.
+    """
+    db = get_db()
+    if isinstance(db, sqlite3.Connection) and not db.in_transaction:
+        db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    else:
+        db.commit()
+
+
 # Compatibility wrapper (some older code used this)
 def execute_query(db_connection, query, params=(), fetch=False, fetchone=False, commit=False):
     return db_execute(query, params=params, fetchall=fetch, fetchone=fetchone, commit=commit)
 
 
-# ---------------- Logging helper ----------------
-def log_action(user_id, role, action):
+# ---------------- Package listing cache ----------------
+def cached_packages(key, loader):
+    """Return package rows for `key` from Redis, running `loader()` on a miss."""
+    if cache is not None:
+        try:
+            hit = cache.get(key)
+            if hit is not None:
+                return json.loads(hit)
+        except Exception as e:
+            print("Cache read error:", e)
+
+    rows = [dict(r) for r in (loader() or [])]
+    if cache is not None:
+        try:
+            cache.setex(key, PACKAGES_CACHE_TTL, json.dumps(rows, default=str))
+        except Exception as e:
+            print("Cache write error:", e)
+    return rows
+
+
+def invalidate_packages_cache():
+    if cache is None:
+        return
     try:
-        if role == "admin":
-            db_execute("INSERT INTO admin_activity (admin_id, role, action) VALUES (?, ?, ?)",
-                       (user_id, role, action), commit=True)
-        else:
-            db_execute("INSERT INTO cloud_activity (user_id, role, action) VALUES (?, ?, ?)",
-                       (user_id, role, action), commit=True)
+        cache.delete("pkgs:top3")
+        for key in cache.scan_iter("pkgs:q:*"):
+            cache.delete(key)
     except Exception as e:
-        print("Log error:", e)
+        print("Cache invalidate error:", e)
+
+
+# Rows per page on the admin list pages
+PAGE_SIZE = 50
+
+# Columns shown on package cards and the booking page (skips the long description)
+CARD_COLUMNS = "id, title, location, price, days, status, image_url"
+
+
+# ---------------- Dashboard counters ----------------
+def bump_stat(key, delta=1):
+    """Increment an admin dashboard counter; run it inside the same transaction as the write it counts."""
+    db_execute("UPDATE stats SET value = value + ? WHERE key = ?", (delta, key))
+
+
+# ---------------- Admin profile cache ----------------
+# Admin rows change only through edit_admin_profile / change_password, which
+# invalidate the entry; the TTL bounds staleness across gunicorn workers.
+ADMIN_CACHE_TTL = 60
+_ADMIN_CACHE = {}
+
+
+def get_admin_profile(admin_id):
+    """Return the admin's display fields as a dict (or None), cached per admin_id."""
+    hit = _ADMIN_CACHE.get(admin_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    row = db_execute("SELECT fullname, email, phone, role, avatar_url FROM admins WHERE id = ?", (admin_id,), fetchone=True)
+    admin = dict(row) if row else None
+    if admin:
+        _ADMIN_CACHE[admin_id] = (time.monotonic() + ADMIN_CACHE_TTL, admin)
+    return admin
+
+
+def invalidate_admin_profile(admin_id):
+    _ADMIN_CACHE.pop(admin_id, None)
+
+
+# ---------------- Email availability cache ----------------
+# /check_email and /check_admin_email fire on every keystroke of the signup forms
+EMAIL_CHECK_TTL = 30
+EMAIL_CHECK_MAX = 1024
+_EMAIL_EXISTS_CACHE = {}
+
+
+def email_exists(table, email):
+    """True if `email` is taken in `table` ("users" or "admins"), cached for EMAIL_CHECK_TTL seconds."""
+    key = (table, email)
+    hit = _EMAIL_EXISTS_CACHE.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    exists = db_execute(f"SELECT 1 FROM {table} WHERE email = ? LIMIT 1", (email,), fetchone=True) is not None
+    if len(_EMAIL_EXISTS_CACHE) >= EMAIL_CHECK_MAX:
+        _EMAIL_EXISTS_CACHE.clear()
+    _EMAIL_EXISTS_CACHE[key] = (time.monotonic() + EMAIL_CHECK_TTL, exists)
+    return exists
+
+
+def invalidate_email_exists(table, email):
+    _EMAIL_EXISTS_CACHE.pop((table, email), None)
+
+
+# ---------------- Logging helper ----------------
+# Activity logs are non-critical, so requests only enqueue them; a daemon thread
+# writes whatever has accumulated every LOG_FLUSH_INTERVAL seconds.
+LOG_FLUSH_INTERVAL = 0.2
+_LOG_Q = queue.Queue()
+_LOG_THREAD = None
+_LOG_THREAD_LOCK = threading.Lock()
+
+
+@contextmanager
+def _background_db():
+    """Connection for work done outside a request (there is no flask.g here)."""
+    pool = get_pg_pool()
+    if pool:
+        db = pool.getconn()
+        try:
+            yield db
+        finally:
+            pool.putconn(db)
+    else:
+        db = get_connection()
+        try:
+            yield db
+        finally:
+            if init_release_connection:
+                init_release_connection(db)
+            else:
+                db.close()
+
+
+def _write_log_batch(batch):
+    admin_rows = [row for row in batch if row[1] == "admin"]
+    other_rows = [row for row in batch if row[1] != "admin"]
+    with _background_db() as db:
+        cur = db.cursor()
+        try:
+            if isinstance(db, sqlite3.Connection) and not db.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            if admin_rows:
+                cur.executemany(app.config["LOG_SQL"]["admin"], admin_rows)
+            if other_rows:
+                cur.executemany(app.config["LOG_SQL"]["other"], other_rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def _log_writer():
+    while True:
+        batch = [_LOG_Q.get()]
+        time.sleep(LOG_FLUSH_INTERVAL)
+        while True:
+            try:
+                batch.append(_LOG_Q.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_log_batch(batch)
+        except Exception as e:
+            print("Log error:", e)
+
+
+def log_action(user_id, role, action):
+    global _LOG_THREAD
+    if _LOG_THREAD is None:
+        # Started lazily so each gunicorn worker gets its own writer after fork
+        with _LOG_THREAD_LOCK:
+            if _LOG_THREAD is None:
+                _LOG_THREAD = threading.Thread(target=_log_writer, name="log-writer", daemon=True)
+                _LOG_THREAD.start()
+    _LOG_Q.put((user_id, role, action))
+
+
+# ---------------- Login throttling ----------------
+# Failed password checks per client IP; once an IP hits the limit, further
+# attempts are refused with 429 before any password hash is computed.
+LOGIN_MAX_FAILURES = 5
+LOGIN_FAILURE_WINDOW = 60
+_LOGIN_FAILURES = {}
+_LOGIN_FAILURES_LOCK = threading.Lock()
+
+
+def _client_ip():
+    # ProxyFix sets remote_addr from the router's hop; client-supplied entries are ignored
+    return request.remote_addr
+
+
+def login_throttled(ip):
+    cutoff = time.monotonic() - LOGIN_FAILURE_WINDOW
+    with _LOGIN_FAILURES_LOCK:
+        failures = _LOGIN_FAILURES.get(ip)
+        if not failures:
+            return False
+        while failures and failures[0] < cutoff:
+            failures.popleft()
+        if not failures:
+            del _LOGIN_FAILURES[ip]
+            return False
+        return len(failures) >= LOGIN_MAX_FAILURES
+
+
+def record_login_failure(ip):
+    with _LOGIN_FAILURES_LOCK:
+        if len(_LOGIN_FAILURES) >= 10000:
+            _LOGIN_FAILURES.clear()
+        _LOGIN_FAILURES.setdefault(ip, deque()).append(time.monotonic())
 
 
 # ---------------- Auth decorators ----------------
@@ -233,7 +571,11 @@ def ping():
 def index():
     rows = []
     try:
-        rows = db_execute("SELECT * FROM packages ORDER BY created_at DESC LIMIT 3", fetchall=True) or []
+        rows = cached_packages(
+            "pkgs:top3",
+            lambda: db_execute("SELECT id, title, location, price, image_url FROM packages ORDER BY created_at DESC LIMIT 3",
+                               fetchall=True)
+        )
     except Exception as e:
         print("Index packages read error:", e)
     return render_template("index.html", packages=rows)
@@ -252,8 +594,10 @@ def contact():
         subject = request.form.get("subject")
         msg = request.form.get("message")
         if msg:
-            db_execute("INSERT INTO feedback (user_name, user_email, subject, message) VALUES (?, ?, ?, ?)",
-                       (name, email, subject, msg), commit=True)
+            with db_transaction():
+                db_execute("INSERT INTO feedback (user_name, user_email, subject, message) VALUES (?, ?, ?, ?)",
+                           (name, email, subject, msg))
+                bump_stat("feedback")
             flash("Thanks for your feedback!", "success")
             log_action(None, "guest", f"Feedback submitted by {email}")
             return redirect(url_for("contact"))
@@ -277,14 +621,14 @@ def user_change_password():
             message = "New passwords do not match."
         else:
             db_execute("UPDATE users SET password_hash = ? WHERE id = ?",
-                       (generate_password_hash(new_password), session["user_id"]), commit=True)
+                       (generate_password_hash(new_password, method=PASSWORD_HASH_METHOD), session["user_id"]), commit=True)
             message = "Password updated successfully!"
     return render_template("user_change_password.html", message=message)
 
 
 @app.route("/package/<int:pid>")
 def package_detail(pid):
-    pkg = db_execute("SELECT * FROM packages WHERE id = ?", (pid,), fetchone=True)
+    pkg = db_execute(f"SELECT {CARD_COLUMNS} FROM packages WHERE id = ?", (pid,), fetchone=True)
     if not pkg:
         abort(404)
     return render_template("book_package.html", package=pkg)
@@ -295,16 +639,19 @@ def explore_packages():
     q = request.args.get("q", "").strip()
     if q:
         like = f"%{q}%"
-        rows = db_execute("SELECT * FROM packages WHERE title LIKE ? OR location LIKE ?", (like, like), fetchall=True) or []
+        rows = cached_packages(
+            f"pkgs:q:{q}",
+            lambda: db_execute(f"SELECT {CARD_COLUMNS} FROM packages WHERE title LIKE ? OR location LIKE ?", (like, like), fetchall=True)
+        )
     else:
-        rows = db_execute("SELECT * FROM packages", fetchall=True) or []
+        rows = cached_packages("pkgs:q:", lambda: db_execute(f"SELECT {CARD_COLUMNS} FROM packages", fetchall=True))
     return render_template("explore_packages.html", packages=rows, q=q)
 
 
 @app.route("/book/<int:package_id>", methods=["GET", "POST"])
 @login_required
 def book_package(package_id):
-    package = db_execute("SELECT * FROM packages WHERE id = ?", (package_id,), fetchone=True)
+    package = db_execute(f"SELECT {CARD_COLUMNS} FROM packages WHERE id = ?", (package_id,), fetchone=True)
     if not package:
         flash("Package not found.", "error")
         return redirect(url_for("explore_packages"))
@@ -326,23 +673,20 @@ def book_package(package_id):
                     INSERT INTO bookings (user_id, package_id, name, email, travel_date, persons, status, booked_at)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """
-                booking_id = db_execute(booking_sql,
-                                        (user_id, package_id, name, email, travel_date, persons, "Confirmed", datetime.now()),
-                                        commit=True, return_lastrowid=True)
-
-                db_execute("INSERT INTO payments (booking_id, user_id, amount, payment_status, payment_method, paid_at) VALUES (?, ?, ?, ?, ?, ?)",
-                           (booking_id, user_id, amount, "SUCCESS", "ONLINE", datetime.now()), commit=True)
+                with db_transaction():
+                    booking_id = db_execute(booking_sql,
+                                            (user_id, package_id, name, email, travel_date, persons, "Confirmed", datetime.now()),
+                                            return_lastrowid=True)
 
-                db_execute("UPDATE bookings SET status = ? WHERE id = ?", ("Confirmed", booking_id), commit=True)
+                    db_execute("INSERT INTO payments (booking_id, user_id, amount, payment_status, payment_method, paid_at) VALUES (?, ?, ?, ?, ?, ?)",
+                               (booking_id, user_id, amount, "SUCCESS", "ONLINE", datetime.now()))
+                    bump_stat("bookings")
+                    bump_stat("revenue", amount)
 
                 flash(f"Booking confirmed! Total: ₹{amount:.2f}", "success")
                 log_action(user_id, "user", f"Booked package: {package['title']} | Amount: ₹{amount:.2f}")
                 return redirect(url_for("my_bookings"))
             except Exception as e:
-                try:
-                    get_db().rollback()
-                except Exception:
-                    pass
                 print("Booking error:", e)
                 flash("Something went wrong during booking!", "error")
 
@@ -365,6 +709,14 @@ def my_bookings():
 
 # ---------------- Admin package CRUD & admin profile ----------------
 
+def valid_package_numbers(price, days):
+    """Mirror the packages CHECK constraints (price >= 0, days > 0) so bad input gets a flash, not a 500."""
+    try:
+        return float(price) >= 0 and int(days) > 0
+    except (TypeError, ValueError):
+        return False
+
+
 @app.route("/admin/add-package", methods=["GET", "POST"])
 @admin_required
 def add_package():
@@ -377,9 +729,12 @@ def add_package():
         image_url = request.form.get("image_url") or "https://picsum.photos/seed/default/800/500"
         if not (title and location and price and days):
             flash("All fields marked * are required.", "error")
+        elif not valid_package_numbers(price, days):
+            flash("Price must be 0 or more and days at least 1.", "error")
         else:
             db_execute("INSERT INTO packages (title, location, description, price, days, image_url, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
                        (title, location, description, price, days, image_url, "Available"), commit=True)
+            invalidate_packages_cache()
             flash("Package added successfully!", "success")
             log_action(session.get("admin_id"), "admin", f"Added new package: {title}")
             return redirect(url_for("admin_packages"))
@@ -399,6 +754,11 @@ def edit_admin_profile():
             flash("Name and email are required.", "error")
         else:
             db_execute("UPDATE admins SET fullname=?, email=?, phone=? WHERE id=?", (name, email, phone, admin_id), commit=True)
+            invalidate_admin_profile(admin_id)
+            invalidate_email_exists("admins", email)
+            if admin:
+                # the previous address is free again
+                invalidate_email_exists("admins", admin["email"])
             flash("Profile updated successfully!", "success")
             return redirect(url_for("admin_profile"))
     return render_template("edit_admin_profile.html", admin=admin)
@@ -421,11 +781,15 @@ def edit_package(pid):
             request.form.get("status"),
             pid
         )
+        if not valid_package_numbers(data[3], data[4]):
+            flash("Price must be 0 or more and days at least 1.", "error")
+            return render_template("edit_package.html", package=package)
         db_execute("""
             UPDATE packages
             SET title=?, location=?, description=?, price=?, days=?, image_url=?, status=?
             WHERE id=?
         """, data, commit=True)
+        invalidate_packages_cache()
         flash("Package updated successfully!", "success")
         log_action(session.get("admin_id"), "admin", f"Edited package ID {pid}")
         return redirect(url_for("admin_packages"))
@@ -447,7 +811,8 @@ def change_password():
         elif new_pwd != confirm_pwd:
             flash("New passwords do not match.", "error")
         else:
-            db_execute("UPDATE admins SET password_hash=? WHERE id=?", (generate_password_hash(new_pwd), admin_id), commit=True)
+            db_execute("UPDATE admins SET password_hash=? WHERE id=?", (generate_password_hash(new_pwd, method=PASSWORD_HASH_METHOD), admin_id), commit=True)
+            invalidate_admin_profile(admin_id)
             flash("Password changed successfully!", "success")
             return redirect(url_for("admin_profile"))
     return render_template("change_password.html")
@@ -456,11 +821,17 @@ def change_password():
 @app.route("/admin/delete-package/<int:pid>", methods=["POST"])
 @admin_required
 def delete_package(pid):
-    package = db_execute("SELECT * FROM packages WHERE id = ?", (pid,), fetchone=True)
+    package = db_execute("SELECT title FROM packages WHERE id = ?", (pid,), fetchone=True)
     if not package:
         abort(404)
-    db_execute("DELETE FROM packages WHERE id = ?", (pid,), commit=True)
     title = package.get("title") if isinstance(package, dict) else package["title"]
+    try:
+        db_execute("DELETE FROM packages WHERE id = ?", (pid,), commit=True)
+    except (sqlite3.IntegrityError, psycopg2.IntegrityError):
+        # bookings.package_id references packages(id); anything else is a real error
+        flash(f"Package '{title}' has bookings and cannot be deleted. Mark it unavailable instead.", "error")
+        return redirect(url_for("admin_packages"))
+    invalidate_packages_cache()
     flash(f"Package '{title}' deleted.", "info")
     log_action(session.get("admin_id"), "admin", f"Deleted package ID {pid}")
     return redirect(url_for("admin_packages"))
@@ -469,7 +840,13 @@ def delete_package(pid):
 @app.route("/admin/bookings")
 @admin_required
 def all_bookings():
-    rows = db_execute("""
+    # keyset pagination on (booked_at, id) of the last row on the previous page;
+    # id breaks ties so rows sharing a booked_at aren't skipped at a page boundary
+    cursor = request.args.get("cursor")
+    after_id = request.args.get("after_id", type=int)
+    if after_id is None:
+        cursor = None
+    rows = db_execute(f"""
         SELECT 
             b.id, 
             u.fullname AS user_name, 
@@ -480,51 +857,52 @@ def all_bookings():
         FROM bookings b
         JOIN users u ON b.user_id = u.id
         JOIN packages p ON p.id = b.package_id
-        ORDER BY b.booked_at DESC
-    """, fetchall=True) or []
-    return render_template("all_bookings.html", bookings=rows)
+        {"WHERE (b.booked_at, b.id) < (?, ?)" if cursor else ""}
+        ORDER BY b.booked_at DESC, b.id DESC
+        LIMIT {PAGE_SIZE}
+    """, (cursor, after_id) if cursor else (), fetchall=True) or []
+    last = rows[-1] if len(rows) == PAGE_SIZE else None
+    return render_template("all_bookings.html", bookings=rows, cursor=cursor,
+                           next_cursor=last["booking_date"] if last else None,
+                           next_id=last["id"] if last else None)
 
 
 @app.route("/check_admin_email")
 def check_admin_email():
     email = request.args.get("email")
-    a = db_execute("SELECT id FROM admins WHERE email = ?", (email,), fetchone=True)
-    return {"exists": bool(a)}
+    return {"exists": email_exists("admins", email)}, 200, {"Cache-Control": "private, max-age=10"}
 
 
 @app.route("/admin/profile")
 @admin_required
 def admin_profile():
     admin_id = session.get("admin_id")
-    admin = db_execute("SELECT * FROM admins WHERE id = ?", (admin_id,), fetchone=True)
+    admin = get_admin_profile(admin_id)
     if not admin:
         flash("Admin not found.", "error")
         return redirect(url_for("admin_dashboard"))
 
-    # counts
-    def _count(q, params=()):
-        r = db_execute(q, params, fetchone=True)
-        if r is None:
-            return 0
-        if isinstance(r, dict):
-            return r.get("c", 0)
-        return r[0]
-
+    # bookings/feedback come from the counters kept in stats
+    counts = db_execute("""
+        SELECT
+            (SELECT COUNT(*) FROM packages) AS total_packages,
+            (SELECT value FROM stats WHERE key = 'bookings') AS total_bookings,
+            (SELECT value FROM stats WHERE key = 'feedback') AS total_feedbacks
+    """, fetchone=True)
     stats = {
-        "total_packages": _count("SELECT COUNT(*) as c FROM packages"),
-        "total_bookings": _count("SELECT COUNT(*) as c FROM bookings"),
-        "total_feedbacks": _count("SELECT COUNT(*) as c FROM feedback"),
+        "total_packages": int(counts["total_packages"] or 0) if counts else 0,
+        "total_bookings": int(counts["total_bookings"] or 0) if counts else 0,
+        "total_feedbacks": int(counts["total_feedbacks"] or 0) if counts else 0,
     }
 
-    avatar_url = admin.get("avatar_url") if isinstance(admin, dict) else (admin["avatar_url"] if "avatar_url" in admin.keys() else None)
-    avatar_url = avatar_url or url_for("static", filename="admin_default.png")
+    avatar_url = admin.get("avatar_url") or url_for("static", filename="admin_default.png")
 
     return render_template("admin_profile.html",
                            admin={
-                               "fullname": admin.get("fullname") if isinstance(admin, dict) else admin["fullname"],
-                               "email": admin.get("email") if isinstance(admin, dict) else admin["email"],
-                               "phone": admin.get("phone", "Not Provided") if isinstance(admin, dict) else (admin["phone"] if "phone" in admin.keys() else "Not Provided"),
-                               "role": admin.get("role", "Administrator") if isinstance(admin, dict) else "Administrator",
+                               "fullname": admin["fullname"],
+                               "email": admin["email"],
+                               "phone": admin.get("phone", "Not Provided"),
+                               "role": admin.get("role") or "Administrator",
                                "avatar_url": avatar_url
                            },
                            stats=stats)
@@ -533,15 +911,30 @@ def admin_profile():
 @app.route("/admin/users")
 @admin_required
 def view_users():
-    rows = db_execute("SELECT id, fullname, email, phone, created_at FROM users", fetchall=True) or []
-    return render_template("user_list.html", users=rows)
+    cursor = request.args.get("cursor", type=int)
+    rows = db_execute(f"""
+        SELECT id, fullname, email, phone, created_at FROM users
+        {"WHERE id < ?" if cursor else ""}
+        ORDER BY id DESC
+        LIMIT {PAGE_SIZE}
+    """, (cursor,) if cursor else (), fetchall=True) or []
+    next_cursor = rows[-1]["id"] if len(rows) == PAGE_SIZE else None
+    return render_template("user_list.html", users=rows, cursor=cursor, next_cursor=next_cursor)
 
 
 @app.route("/admin/feedback")
 @admin_required
 def feedback_reports():
-    rows = db_execute("SELECT * FROM feedback ORDER BY created_at DESC", fetchall=True) or []
-    return render_template("feedback_reports.html", feedbacks=rows)
+    # ids follow insertion order, so they page the same as created_at without ties
+    cursor = request.args.get("cursor", type=int)
+    rows = db_execute(f"""
+        SELECT id, user_name, user_email, subject, message, created_at FROM feedback
+        {"WHERE id < ?" if cursor else ""}
+        ORDER BY id DESC
+        LIMIT {PAGE_SIZE}
+    """, (cursor,) if cursor else (), fetchall=True) or []
+    next_cursor = rows[-1]["id"] if len(rows) == PAGE_SIZE else None
+    return render_template("feedback_reports.html", feedbacks=rows, cursor=cursor, next_cursor=next_cursor)
 
 
 # ---------------- User auth ----------------
@@ -556,8 +949,11 @@ def register():
             flash("All fields are required.", "error")
         else:
             try:
-                db_execute("INSERT INTO users (fullname, email, password_hash) VALUES (?, ?, ?)",
-                           (fullname, email, generate_password_hash(password)), commit=True)
+                with db_transaction():
+                    db_execute("INSERT INTO users (fullname, email, password_hash) VALUES (?, ?, ?)",
+                               (fullname, email, generate_password_hash(password, method=PASSWORD_HASH_METHOD)))
+                    bump_stat("users")
+                invalidate_email_exists("users", email)
                 flash("Registration successful! Please log in.", "success")
                 log_action(None, "guest", f"User registered: {email}")
                 return redirect(url_for("login"))
@@ -570,9 +966,13 @@ def register():
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
+        ip = _client_ip()
+        if login_throttled(ip):
+            flash("Too many failed login attempts. Please wait a minute and try again.", "error")
+            return render_template("login.html"), 429
         email = request.form.get("email")
         password = request.form.get("password")
-        user = db_execute("SELECT * FROM users WHERE email = ?", (email,), fetchone=True)
+        user = db_execute("SELECT id, fullname, password_hash FROM users WHERE email = ?", (email,), fetchone=True)
         if not user:
             flash("Email not found. Please register first.", "error")
             return redirect(url_for("login"))
@@ -585,6 +985,7 @@ def login():
             session["user_name"] = user_fullname
             log_action(user_id, "user", "User logged in")
             return redirect(url_for("main_dashboard"))
+        record_login_failure(ip)
         flash("Incorrect password.", "error")
     return render_template("login.html")
 
@@ -592,8 +993,7 @@ def login():
 @app.route("/check_email")
 def check_email():
     email = request.args.get("email")
-    existing_user = db_execute("SELECT id FROM users WHERE email = ?", (email,), fetchone=True)
-    return {"exists": bool(existing_user)}
+    return {"exists": email_exists("users", email)}, 200, {"Cache-Control": "private, max-age=10"}
 
 
 @app.route("/logout")
@@ -608,25 +1008,27 @@ def logout():
 @login_required
 def main_dashboard():
     user_id = session["user_id"]
-
-    def _val_count(q, params=()):
-        r = db_execute(q, params, fetchone=True)
-        if not r:
-            return 0
-        if isinstance(r, dict):
-            return r.get("c", 0)
-        return r[0]
-
-    total_bookings = _val_count("SELECT COUNT(*) as c FROM bookings WHERE user_id = ?", (user_id,))
-    upcoming_trips = _val_count("SELECT COUNT(*) as c FROM bookings WHERE user_id = ? AND date(travel_date) >= date('now')", (user_id,))
-    completed_trips = _val_count("SELECT COUNT(*) as c FROM bookings WHERE user_id = ? AND date(travel_date) < date('now')", (user_id,))
+    # travel_date is stored as ISO text, so plain comparisons can use the index
+    today = datetime.now().date().isoformat()
+
+    counts = db_execute("""
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(CASE WHEN travel_date >= ? THEN 1 ELSE 0 END), 0) AS upcoming,
+            COALESCE(SUM(CASE WHEN travel_date < ? THEN 1 ELSE 0 END), 0) AS completed
+        FROM bookings
+        WHERE user_id = ?
+    """, (today, today, user_id), fetchone=True)
+    total_bookings = counts["total"] if counts else 0
+    upcoming_trips = counts["upcoming"] if counts else 0
+    completed_trips = counts["completed"] if counts else 0
 
     recent_bookings = db_execute("""
         SELECT p.title, p.location, b.travel_date
         FROM bookings b
         JOIN packages p ON p.id = b.package_id
         WHERE b.user_id = ?
-        ORDER BY date(b.travel_date) DESC
+        ORDER BY b.travel_date DESC
         LIMIT 5
     """, (user_id,), fetchall=True) or []
 
@@ -659,9 +1061,13 @@ def main_dashboard():
 @app.route("/admin/login", methods=["GET", "POST"])
 def admin_login():
     if request.method == "POST":
+        ip = _client_ip()
+        if login_throttled(ip):
+            flash("Too many failed login attempts. Please wait a minute and try again.", "error")
+            return render_template("admin_login.html"), 429
         email = request.form.get("email")
         password = request.form.get("password")
-        a = db_execute("SELECT * FROM admins WHERE email = ?", (email,), fetchone=True)
+        a = db_execute("SELECT id, fullname, password_hash FROM admins WHERE email = ?", (email,), fetchone=True)
         if not a:
             flash("Admin email not found.", "error")
             return redirect(url_for("admin_login"))
@@ -674,6 +1080,7 @@ def admin_login():
             session["admin_name"] = admin_name
             log_action(admin_id, "admin", "Admin logged in")
             return redirect(url_for("admin_dashboard"))
+        record_login_failure(ip)
         flash("Incorrect password.", "error")
     return render_template("admin_login.html")
 
@@ -681,11 +1088,16 @@ def admin_login():
 @app.route("/update-profile", methods=["POST"])
 @login_required
 def update_profile():
+    old = db_execute("SELECT email FROM users WHERE id=?", (session["user_id"],), fetchone=True)
     db_execute(
         "UPDATE users SET fullname=?, email=?, phone=?, location=? WHERE id=?",
         (request.form["name"], request.form["email"], request.form["phone"], request.form["location"], session["user_id"]),
         commit=True
     )
+    invalidate_email_exists("users", request.form["email"])
+    if old:
+        # the previous address is free again
+        invalidate_email_exists("users", old["email"])
     flash("Profile updated successfully!", "success")
     return redirect(url_for("profile"))
 
@@ -724,7 +1136,8 @@ def admin_register():
 
         try:
             db_execute("INSERT INTO admins (fullname, email, password_hash) VALUES (?, ?, ?)",
-                       (fullname, email, generate_password_hash(password)), commit=True)
+                       (fullname, email, generate_password_hash(password, method=PASSWORD_HASH_METHOD)), commit=True)
+            invalidate_email_exists("admins", email)
             flash("New admin registered successfully!", "success")
             return redirect(url_for("admin_login"))
         except Exception as e:
@@ -745,37 +1158,21 @@ def admin_logout():
 @app.route("/admin")
 @admin_required
 def admin_dashboard():
-    # counts
-    def _val(row):
-        if not row:
-            return 0
-        if isinstance(row, dict):
-            return row.get("c", 0)
-        return row[0]
-
-    total_users = _val(db_execute("SELECT COUNT(*) AS c FROM users", fetchone=True))
-    total_bookings = _val(db_execute("SELECT COUNT(*) AS c FROM bookings", fetchone=True))
-    total_revenue = _val(db_execute("SELECT COALESCE(SUM(amount),0) AS c FROM payments WHERE TRIM(LOWER(payment_status)) = 'success'", fetchone=True))
-
-    # feedback count safely
-    try:
-        fb_count_row = db_execute("SELECT COUNT(*) AS c FROM feedback", fetchone=True)
-        new_messages = _val(fb_count_row)
-    except Exception:
-        new_messages = 0
+    # counters maintained on write (see bump_stat)
+    stats = {row["key"]: row["value"] for row in (db_execute("SELECT key, value FROM stats", fetchall=True) or [])}
+    total_users = int(stats.get("users") or 0)
+    total_bookings = int(stats.get("bookings") or 0)
+    total_revenue = stats.get("revenue") or 0
+    new_messages = int(stats.get("feedback") or 0)
 
     admin_id = session.get("admin_id")
-    admin = db_execute("SELECT fullname, email, avatar_url, phone, role FROM admins WHERE id = ?", (admin_id,), fetchone=True)
+    admin = get_admin_profile(admin_id)
 
     if admin:
-        if isinstance(admin, dict):
-            admin_name = admin.get("fullname", "Admin")
-            admin_email = admin.get("email", "admin@example.com")
-            admin_avatar_url = admin.get("avatar_url") or url_for("static", filename="admin_default.png")
-        else:
-            admin_name = admin["fullname"]
-            admin_email = admin["email"]
-            admin_avatar_url = admin["avatar_url"] if "avatar_url" in admin.keys() and admin["avatar_url"] else url_for("static", filename="admin_default.png")
+        # get_admin_profile always hands back a plain dict
+        admin_name = admin.get("fullname", "Admin")
+        admin_email = admin.get("email", "admin@example.com")
+        admin_avatar_url = admin.get("avatar_url") or url_for("static", filename="admin_default.png")
     else:
         admin_name = "Admin"
         admin_email = "admin@example.com"
@@ -794,7 +1191,7 @@ def admin_dashboard():
 @app.route("/admin/packages")
 @admin_required
 def admin_packages():
-    rows = db_execute("SELECT * FROM packages", fetchall=True) or []
+    rows = db_execute("SELECT id, title, location, price, days, status FROM packages", fetchall=True) or []
     return render_template("manage_packages.html", packages=rows)
 
 
@@ -1,4 +1,12 @@
 import os
+import sys
+
+# The avatar ships in the repo; only regenerate it when it is missing
+output_path = os.path.join("static", "admin_default.png")
+if os.path.exists(output_path):
+    print(f"ℹ️ Default admin avatar already exists at {output_path} — skipping.")
+    sys.exit(0)
+
 from PIL import Image, ImageDraw, ImageFont
 
 # Ensure 'static' folder exists
@@ -23,6 +31,5 @@ y = (img.height - text_h) / 2
 draw.text((x, y), text, fill=(255, 255, 255), font=font)
 
 # Save inside 'static' folder
-output_path = os.path.join("static", "admin_default.png")
 img.save(output_path)
 print(f"✅ Default admin avatar created at {output_path}")